@@ -0,0 +1,92 @@
+# ==========================================
+# bench_protocolo.py
+# Compara bytes en el cable y tiempo de parseo: JSON por línea,
+# lote JSON y formato binario (individual y en lote)
+# ==========================================
+#
+# Corre en el PC (python bench_protocolo.py) o en la Pico copiando
+# protocolo.py y este archivo. Solo mide separar + decodificar tramas
+# por el mismo camino que main.recibir_datos (limites_trama sobre el
+# buffer, sin copiar el resto), no la ejecución de los comandos.
+
+import protocolo
+
+try:
+    from time import perf_counter
+
+    def _ahora_us():
+        return perf_counter() * 1e6
+except ImportError:
+    from utime import ticks_us as _ahora_us
+
+TOPIC_STATE = "UDFJC/emb1/robot2/RPi/state"
+TOPIC_SEQ = "UDFJC/emb1/robot2/RPi/sequence"
+REPETICIONES = 20
+
+
+def _estado(i):
+    return {"v": 0.5, "w": 0.0, "alfa0": i % 90, "alfa1": 45, "alfa2": -90 + i % 45, "duration": 0.2}
+
+
+def _escenario_secuencia(n_estados):
+    """Una secuencia grande: create + schedule."""
+    return TOPIC_SEQ, [
+        {"action": "create", "sequence": {"name": "larga", "states": [_estado(i) for i in range(n_estados)]}},
+        {"action": "schedule", "name": "larga", "time": "2030-01-01T12:00:00"},
+    ]
+
+
+def _escenario_teleop(n):
+    """Flujo de teleoperación: muchos 'state' seguidos."""
+    return TOPIC_STATE, [_estado(i) for i in range(n)]
+
+
+def _parsear(buf):
+    n = 0
+    i = 0
+    while True:
+        limites = protocolo.limites_trama(buf, i)
+        if limites is None:
+            break
+        fin, siguiente = limites
+        if buf[i] == protocolo.MARCA_BIN:
+            obj = protocolo.decodificar_bin(buf, i, fin)
+        else:
+            obj = protocolo.decodificar(buf[i:fin])
+        i = siguiente
+        if obj:
+            n += 1
+    return n
+
+
+def _medir(stream):
+    t0 = _ahora_us()
+    for _ in range(REPETICIONES):
+        _parsear(stream)
+    return (_ahora_us() - t0) / REPETICIONES
+
+
+def comparar(nombre, topic, datos):
+    variantes = (
+        ("json x1", b"".join(protocolo.codificar_json({"topic": topic, "data": d}) for d in datos)),
+        ("json lote", protocolo.codificar_json({"topic": topic, "batch": datos})),
+        ("bin x1", b"".join(protocolo.codificar_bin({"topic": topic, "data": d}) for d in datos)),
+        ("bin lote", protocolo.codificar_bin({"topic": topic, "batch": datos})),
+    )
+    print("\n📊 {} ({} comandos)".format(nombre, len(datos)))
+    print("{:<10} {:>10} {:>12} {:>8}".format("formato", "bytes", "parseo(us)", "vs json"))
+    base = None
+    for etiqueta, stream in variantes:
+        t = _medir(stream)
+        if base is None:
+            base = t
+        print("{:<10} {:>10} {:>12.1f} {:>7.2f}x".format(etiqueta, len(stream), t, base / t))
+
+
+def main():
+    comparar("Secuencia de 200 estados", *_escenario_secuencia(200))
+    comparar("Teleop 200 estados", *_escenario_teleop(200))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# ==========================================
+# captura.py
+# Grabación compacta de las tramas recibidas del broker
+# ==========================================
+#
+# Formato del archivo:
+#   cabecera: b"CAP1" | epoch (u32) | ticks_ms inicial (u32)
+#   registro: ticks_ms (u32) | longitud (u32) | trama
+# La trama se guarda tal cual llega (línea JSON sin '\n' o trama binaria),
+# así replay.py la puede volver a pasar por protocolo.decodificar().
+
+import time
+
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+try:
+    from utime import ticks_ms
+except ImportError:
+    # En el PC (CPython) no existe utime
+    def ticks_ms():
+        return int(time.monotonic() * 1000) & 0x3FFFFFFF
+
+MAGIA = b"CAP1"
+_FMT_CABECERA = "<4sII"
+_FMT_REGISTRO = "<II"
+_TAM_CABECERA = struct.calcsize(_FMT_CABECERA)
+_TAM_REGISTRO = struct.calcsize(_FMT_REGISTRO)
+
+
+class Captura:
+    """
+    Escribe cada trama recibida con su ticks_ms en 'nombre_archivo',
+    hasta 'max_bytes' en total (la flash de la Pico W es pequeña).
+    """
+
+    def __init__(self, nombre_archivo, max_bytes=256 * 1024, flush_cada=16):
+        self.f = open(nombre_archivo, "wb")
+        self.f.write(struct.pack(_FMT_CABECERA, MAGIA, int(time.time()), ticks_ms()))
+        self.max_bytes = max_bytes
+        self.bytes = _TAM_CABECERA
+        self.flush_cada = flush_cada
+        self.pendientes = 0
+        self.total = 0
+        print(f"🎙️ Capturando tramas en {nombre_archivo}")
+
+    def registrar(self, trama, t=None):
+        """
+        Guarda una trama con 't', el ticks_ms de su llegada (el del recv;
+        por defecto, ahora). Devuelve False si la captura se detuvo (límite
+        de tamaño o error de escritura, p. ej. flash llena); el archivo
+        queda cerrado y el robot debe seguir sin capturar.
+        """
+        if self.f is None:
+            return False
+        if t is None:
+            t = ticks_ms()
+        tam = _TAM_REGISTRO + len(trama)
+        if self.bytes + tam > self.max_bytes:
+            print(f"🎙️ Captura llena ({self.max_bytes} bytes)")
+            self.cerrar()
+            return False
+        try:
+            self.f.write(struct.pack(_FMT_REGISTRO, t, len(trama)))
+            self.f.write(trama)
+            self.bytes += tam
+            self.total += 1
+            self.pendientes += 1
+            # Escribir a flash por bloques, no en cada trama
+            if self.pendientes >= self.flush_cada:
+                self.f.flush()
+                self.pendientes = 0
+        except OSError as e:
+            print("⚠️ Error escribiendo la captura, se detiene:", e)
+            self.cerrar()
+            return False
+        return True
+
+    def cerrar(self):
+        if self.f is None:
+            return
+        try:
+            self.f.close()
+        except OSError as e:
+            print("⚠️ Error cerrando la captura:", e)
+        self.f = None
+        print(f"🎙️ Captura cerrada ({self.total} tramas)")
+
+
+def leer_captura(nombre_archivo):
+    """
+    Lee una captura completa.
+    Devuelve (epoch, ticks_inicial, [(ticks_ms, trama), ...]).
+    """
+    with open(nombre_archivo, "rb") as f:
+        datos = f.read()
+    magia, epoch, ticks0 = struct.unpack_from(_FMT_CABECERA, datos, 0)
+    if magia != MAGIA:
+        raise ValueError("archivo de captura inválido: {}".format(nombre_archivo))
+    registros = []
+    i = _TAM_CABECERA
+    while i + _TAM_REGISTRO <= len(datos):
+        t, n = struct.unpack_from(_FMT_REGISTRO, datos, i)
+        i += _TAM_REGISTRO
+        if i + n > len(datos):
+            break  # último registro cortado (sin flush antes de apagar)
+        registros.append((t, datos[i:i + n]))
+        i += n
+    return epoch, ticks0, registros
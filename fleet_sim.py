@@ -0,0 +1,331 @@
+# ==========================================
+# fleet_sim.py
+# Simulador de flota: N robots (main.py) contra un broker local
+# ==========================================
+#
+#   python fleet_sim.py --robots 10 50 100 200 --segundos 10
+#   python fleet_sim.py --robots 100 --formato bin
+#   python fleet_sim.py --escala 0        # solo CPU/transporte, sin sleeps
+#
+# Por defecto (--escala 1) los sleep del robot se esperan de verdad: el
+# parpadeo de 0.5 s del LED en cada mensaje (también los de otros robots) y
+# la interpolación de los servos bloquean recibir_loop como en la Pico, y
+# eso es lo que domina la latencia cuando la flota crece. Con --escala 0 los
+# números miden solo CPU y transporte.
+#
+# Cada robot es una instancia de main.py con hardware falso (stubs_host.py)
+# y su propio ROBOT_ID, corriendo recibir_loop en un hilo sobre un socket
+# real. El broker habla el mismo protocolo de líneas JSON:
+#   {"action": "SUB", "topic": "...", "format": "json"|"bin"}
+#   {"action": "PUB", "topic": "...", "data": {...}}
+# y reenvía {"topic", "data"} a cada suscriptor cuyo patrón coincida
+# ('+' = un nivel del topic).
+#
+# Por cada escala N reporta:
+#   - mensajes/s atendidos por robot y % de los publicados que alcanzó a
+#     atender antes del límite de espera (si baja de 100% está saturado)
+#   - % de mensajes y CPU (ms por segundo) gastados en topics de otros robots
+#   - latencia comando -> actuación (primer duty_u16 de un servo) en ms
+
+import argparse
+import collections
+import contextlib
+import json
+import os
+import select
+import socket
+import threading
+import time
+
+import protocolo
+import stubs_host
+from replay import percentiles
+
+_hilo = threading.local()
+
+
+# ------------------------------------------
+# Broker local
+# ------------------------------------------
+def coincide(patron, topic):
+    """Compara un topic con un patrón de suscripción con '+'."""
+    p = patron.split("/")
+    t = topic.split("/")
+    if len(p) != len(t):
+        return False
+    for a, b in zip(p, t):
+        if a != "+" and a != b:
+            return False
+    return True
+
+
+class Broker:
+    def __init__(self):
+        self.srv = socket.socket()
+        self.srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.srv.bind(("127.0.0.1", 0))
+        self.srv.listen(1024)
+        self.puerto = self.srv.getsockname()[1]
+        self.subs = []  # (patron, formato, cliente)
+        self.clientes = []
+        self.lock = threading.Lock()
+        self.activo = True
+        threading.Thread(target=self._aceptar, daemon=True).start()
+
+    def _aceptar(self):
+        while self.activo:
+            try:
+                c, _ = self.srv.accept()
+            except OSError:
+                return
+            c.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            cliente = [c, threading.Lock()]
+            with self.lock:
+                self.clientes.append(cliente)
+            threading.Thread(target=self._atender, args=(cliente,), daemon=True).start()
+
+    def _atender(self, cliente):
+        f = cliente[0].makefile("rb")
+        for linea in f:
+            try:
+                msg = json.loads(linea)
+            except ValueError:
+                continue
+            action = msg.get("action")
+            if action == "SUB":
+                with self.lock:
+                    self.subs.append((msg["topic"], msg.get("format", protocolo.FORMATO_JSON), cliente))
+            elif action == "PUB":
+                self.publicar(msg["topic"], msg.get("data"))
+
+    def publicar(self, topic, data):
+        obj = {"topic": topic, "data": data}
+        tramas = {}
+        with self.lock:
+            destinos = [(fmt, c) for patron, fmt, c in self.subs if coincide(patron, topic)]
+        for fmt, (c, lock) in destinos:
+            if fmt not in tramas:
+                tramas[fmt] = protocolo.codificar_bin(obj) if fmt == protocolo.FORMATO_BIN \
+                    else protocolo.codificar_json(obj)
+            try:
+                with lock:
+                    c.sendall(tramas[fmt])
+            except OSError:
+                pass
+
+    def suscripciones(self):
+        with self.lock:
+            return len(self.subs)
+
+    def cerrar(self):
+        self.activo = False
+        self.srv.close()
+        with self.lock:
+            clientes = list(self.clientes)
+        for c, _ in clientes:
+            try:
+                c.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            c.close()
+
+
+# ------------------------------------------
+# Robots
+# ------------------------------------------
+class _ProtocoloMedido:
+    """Envuelve protocolo para medir el CPU de decodificar en cada robot."""
+
+    def __getattr__(self, nombre):
+        return getattr(protocolo, nombre)
+
+    def decodificar(self, trama):
+        t0 = time.thread_time()
+        obj = protocolo.decodificar(trama)
+        _hilo.cpu_parseo = time.thread_time() - t0
+        return obj
+
+    def decodificar_bin(self, buf, i=0, fin=None):
+        t0 = time.thread_time()
+        obj = protocolo.decodificar_bin(buf, i, fin)
+        _hilo.cpu_parseo = time.thread_time() - t0
+        return obj
+
+
+class Metricas:
+    def __init__(self, robot_id):
+        self.robot_id = robot_id
+        self.propios = 0
+        self.ajenos = 0
+        self.cpu_propios = 0.0
+        self.cpu_ajenos = 0.0
+        self.latencias = []
+
+
+def _al_actuar(pwm):
+    if getattr(_hilo, "t_envio", None) is not None and _hilo.actuado is None:
+        _hilo.actuado = time.perf_counter()
+
+
+def crear_robot(i, puerto, formato, pendientes):
+    robot_id = "robot{}".format(i)
+    config = {"BROKER_IP": "127.0.0.1", "BROKER_PORT": str(puerto),
+              "ROBOT_ID": robot_id, "FORMATO": formato}
+    m = stubs_host.cargar_main("robot_{}".format(i), config)
+    m.protocolo = _ProtocoloMedido()
+    met = Metricas(robot_id)
+    propio = "/{}/".format(robot_id)
+    original = m.procesar_mensaje
+    cola = pendientes[robot_id]
+
+    def procesar_medido(obj):
+        topic = obj.get("topic", "")
+        es_propio = propio in topic
+        _hilo.t_envio = cola.popleft() if es_propio and topic == m.TOPIC_SUB_1 and cola else None
+        _hilo.actuado = None
+        t0 = time.thread_time()
+        original(obj)
+        cpu = time.thread_time() - t0 + getattr(_hilo, "cpu_parseo", 0.0)
+        if es_propio:
+            met.propios += 1
+            met.cpu_propios += cpu
+        else:
+            met.ajenos += 1
+            met.cpu_ajenos += cpu
+        if _hilo.t_envio is not None and _hilo.actuado is not None:
+            met.latencias.append(_hilo.actuado - _hilo.t_envio)
+        _hilo.t_envio = None
+
+    m.procesar_mensaje = procesar_medido
+
+    def correr():
+        sock = m.conectar_broker()
+        m.suscribir(sock, m.TOPIC_SUB_1)
+        m.suscribir(sock, m.TOPIC_SUB_2)
+        m.recibir_loop(sock)
+
+    return threading.Thread(target=correr, daemon=True), met
+
+
+# ------------------------------------------
+# Generador de tráfico
+# ------------------------------------------
+def _estado(k):
+    return {"v": 0, "w": 0, "alfa0": k % 90, "alfa1": 45, "alfa2": -60, "duration": 0}
+
+
+def generar_trafico(puerto, n, segundos, hz_state, hz_seq, pendientes):
+    """
+    Publica, por robot, 'state' a hz_state y tráfico de 'sequence'
+    (create / add_state / delete) a hz_seq. La secuencia le llega a toda
+    la flota por la suscripción UDFJC/emb1/+/RPi/sequence.
+    """
+    s = socket.create_connection(("127.0.0.1", puerto))
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    eventos = []
+    for i in range(n):
+        fase = i / n
+        for k in range(int(segundos * hz_state)):
+            eventos.append(((k + fase) / hz_state, i, "state", k))
+        for k in range(int(segundos * hz_seq)):
+            eventos.append(((k + fase) / hz_seq, i, "sequence", k))
+    eventos.sort()
+
+    inicio = time.perf_counter()
+    for t, i, tipo, k in eventos:
+        espera = inicio + t - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+        robot_id = "robot{}".format(i)
+        topic = "UDFJC/emb1/{}/RPi/{}".format(robot_id, tipo)
+        if tipo == "state":
+            data = _estado(k)
+            pendientes[robot_id].append(time.perf_counter())
+        else:
+            nombre = "{}_s{}".format(robot_id, k // 3)
+            data = ({"action": "create", "sequence": {"name": nombre, "states": [_estado(k)] * 4}},
+                    {"action": "add_state", "name": nombre, "state": _estado(k)},
+                    {"action": "delete", "name": nombre})[k % 3]
+        s.sendall(protocolo.codificar_json({"action": "PUB", "topic": topic, "data": data}))
+    s.close()
+
+
+# ------------------------------------------
+# Escenario
+# ------------------------------------------
+def simular(n, segundos, hz_state, hz_seq, formato):
+    broker = Broker()
+    pendientes = collections.defaultdict(collections.deque)
+    robots = [crear_robot(i, broker.puerto, formato, pendientes) for i in range(n)]
+    for hilo, _ in robots:
+        hilo.start()
+    while broker.suscripciones() < 2 * n:
+        time.sleep(0.01)
+
+    t0 = time.perf_counter()
+    generar_trafico(broker.puerto, n, segundos, hz_state, hz_seq, pendientes)
+
+    # Dejar que los robots vacíen sus sockets (con un límite por si se atascan)
+    esperados = n * (int(segundos * hz_state) + n * int(segundos * hz_seq))
+    limite = time.perf_counter() + 2 * segundos + 5
+    while time.perf_counter() < limite:
+        if sum(met.propios + met.ajenos for _, met in robots) >= esperados:
+            break
+        time.sleep(0.05)
+    duracion = time.perf_counter() - t0
+    broker.cerrar()
+    for hilo, _ in robots:
+        hilo.join(2)
+    return [met for _, met in robots], duracion, esperados
+
+
+def reporte(n, metricas, duracion, esperados):
+    tasa = sum(m.propios + m.ajenos for m in metricas) / len(metricas) / duracion
+    ajenos = sum(m.ajenos for m in metricas)
+    total = sum(m.propios + m.ajenos for m in metricas) or 1
+    cpu_ajenos = sum(m.cpu_ajenos for m in metricas) / len(metricas) / duracion * 1000
+    cpu_total = sum(m.cpu_ajenos + m.cpu_propios for m in metricas) or 1e-9
+    lat = []
+    for m in metricas:
+        lat.extend(m.latencias)
+    p = percentiles(lat)
+    atendidos = 100 * sum(m.propios + m.ajenos for m in metricas) / (esperados or 1)
+    print("{:>5} {:>10.1f} {:>9.1f}% {:>9.1f}% {:>12.2f} {:>9.1f}% {:>8.2f} {:>8.2f} {:>8.2f}".format(
+        n, tasa, atendidos, 100 * ajenos / total, cpu_ajenos,
+        100 * sum(m.cpu_ajenos for m in metricas) / cpu_total,
+        p.get(50, 0) * 1000, p.get(95, 0) * 1000, p.get(99, 0) * 1000))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulador de flota contra un broker local")
+    ap.add_argument("--robots", type=int, nargs="+", default=[10, 50, 100, 200])
+    ap.add_argument("--segundos", type=float, default=10)
+    ap.add_argument("--hz-state", type=float, default=2, help="comandos 'state' por robot y segundo")
+    ap.add_argument("--hz-seq", type=float, default=0.5, help="mensajes 'sequence' por robot y segundo")
+    ap.add_argument("--formato", choices=(protocolo.FORMATO_JSON, protocolo.FORMATO_BIN),
+                    default=protocolo.FORMATO_JSON)
+    ap.add_argument("--escala", type=float, default=1,
+                    help="fracción de los sleep del robot que se esperan de verdad "
+                         "(1 = como en la Pico, 0 = ninguno: solo CPU/transporte)")
+    args = ap.parse_args()
+
+    stubs_host.instalar(stubs_host.RelojReal(args.escala), usocket=socket, uselect=select)
+    stubs_host.observadores_pwm.append(_al_actuar)
+
+    print("⏱️ escala de sleeps = {:g} ({})".format(
+        args.escala, "tiempos del robot reales" if args.escala == 1 else
+        "sleeps comprimidos: latencia y msg/s son solo CPU/transporte"
+        if args.escala == 0 else "sleeps comprimidos: latencia y msg/s subestimados"))
+    print("{:>5} {:>10} {:>10} {:>10} {:>12} {:>10} {:>8} {:>8} {:>8}".format(
+        "N", "msg/s/rob", "atendidos", "ajenos", "cpu ajenos", "cpu ajeno", "lat p50", "lat p95", "lat p99"))
+    print("{:>5} {:>10} {:>10} {:>10} {:>12} {:>10} {:>8} {:>8} {:>8}".format(
+        "", "", "(%)", "(msgs)", "(ms/s/rob)", "(% cpu)", "(ms)", "(ms)", "(ms)"))
+    nulo = open(os.devnull, "w")
+    for n in args.robots:
+        with contextlib.redirect_stdout(nulo):
+            metricas, duracion, esperados = simular(n, args.segundos, args.hz_state, args.hz_seq, args.formato)
+        reporte(n, metricas, duracion, esperados)
+
+
+if __name__ == "__main__":
+    main()
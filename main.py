@@ -2,8 +2,12 @@ import socket
 import json
 import time
 import robot_servos    # ✅ usamos la librería para los servos
+import robot_ik        # ✅ cinemática inversa para estados con "target"
 import wifi_lib  # ✅ usamos la librería para WiFi
 import rtc_lib   # ✅ usamos la librería RTC
+import protocolo # ✅ tramas JSON, lotes y formato binario
+import captura   # ✅ grabación de tramas para replay.py
+import memoria   # ✅ GC en puntos seguros y métricas del heap
 import utime
 from robot_pid import mover_recto, girar# ✅ usamos la librería para los motores y encoders
 from machine import Pin  # ✅ para el LED integrado
@@ -21,11 +25,15 @@ config = wifi_lib.cargar_config("Conexion4.txt")
 BROKER_IP   = config.get("BROKER_IP", "")
 print(BROKER_IP)
 BROKER_PORT = int(config.get("BROKER_PORT", 5051))
+FORMATO     = config.get("FORMATO", protocolo.FORMATO_JSON)  # "json" o "bin"
+CAPTURA     = config.get("CAPTURA", "")  # archivo donde grabar las tramas ("" = no grabar)
+CAPTURA_MAX = int(config.get("CAPTURA_MAX", 256 * 1024))  # bytes máximos de la captura
 
 # -----------------------------
-# TOPICS (fijos)
+# TOPICS
 # -----------------------------
-TOPIC_SUB_1 = "UDFJC/emb1/robot2/RPi/state"
+ROBOT_ID    = config.get("ROBOT_ID", "robot2")
+TOPIC_SUB_1 = f"UDFJC/emb1/{ROBOT_ID}/RPi/state"
 TOPIC_SUB_2 = "UDFJC/emb1/+/RPi/sequence"
 
 # -----------------------------
@@ -34,6 +42,7 @@ TOPIC_SUB_2 = "UDFJC/emb1/+/RPi/sequence"
 robot_servos.mover_servos(0, 45, -90, 1)
 datos_recibidos = []
 secuencias = {}
+grabadora = None  # captura.Captura activa, si CAPTURA está configurado
 
 # -----------------------------
 # FUNCIÓN CONEXIÓN BROKER
@@ -48,6 +57,47 @@ def conectar_broker():
 def enviar_json(sock, obj):
     msg = json.dumps(obj) + "\n"
     sock.send(msg.encode())
+
+def suscribir(sock, topic):
+    """
+    Se suscribe al topic. Si FORMATO es "bin" se pide al broker que
+    entregue ese topic en formato binario compacto (ver protocolo.py).
+    """
+    msg = {"action": "SUB", "topic": topic}
+    if FORMATO != protocolo.FORMATO_JSON:
+        msg["format"] = FORMATO
+    enviar_json(sock, msg)
+    print(f"📝 Suscrito al tópico: {topic} ({FORMATO})")
+
+def resolver_angulos(estado):
+    """
+    Ángulos (alfa0, alfa1, alfa2) de un estado. Si trae "target": {"x", "y", "z"}
+    en cm se calculan con robot_ik; si no, se usan alfa0/alfa1/alfa2 tal cual.
+    Devuelve (None, None, None) si el objetivo no es válido o no es alcanzable.
+    """
+    objetivo = estado.get("target", None)
+    if objetivo is None:
+        return estado.get("alfa0"), estado.get("alfa1"), estado.get("alfa2")
+    try:
+        x = float(objetivo["x"]); y = float(objetivo["y"]); z = float(objetivo["z"])
+    except (KeyError, TypeError, ValueError):
+        print("⚠️ 'target' debe traer x, y, z numéricos.")
+        return None, None, None
+    angulos = robot_ik.resolver(x, y, z)
+    if angulos is None:
+        print(f"⚠️ Objetivo ({x}, {y}, {z}) fuera del alcance del brazo.")
+        return None, None, None
+    print(f"🎯 Objetivo ({x}, {y}, {z}) → α0={angulos[0]}, α1={angulos[1]}, α2={angulos[2]}")
+    return angulos
+
+def estado_alcanzable(estado):
+    """
+    Para validar al crear/agregar: False si el estado es un dict con
+    "target" inválido o fuera de alcance. Los demás se revisan al ejecutar.
+    """
+    if not isinstance(estado, dict) or "target" not in estado:
+        return True
+    return resolver_angulos(estado)[0] is not None
 #------------------------------
 #Definicion de ejecucion de secuencia
 #------------------------------
@@ -63,7 +113,9 @@ def ejecutar_secuencia(nombre):
     for i, paso in enumerate(secuencias[nombre], 1):
         try:
             v = paso["v"]; w = paso["w"]
-            n1 = paso["alfa0"]; n2 = paso["alfa1"]; n3 = paso["alfa2"]; dur = paso["duration"]
+            n1, n2, n3 = resolver_angulos(paso); dur = paso["duration"]
+            if None in (n1, n2, n3):
+                raise ValueError("faltan ángulos o 'target' inalcanzable")
             print(f"▶️ Paso {i}: v={v}, w={w}, α0={n1}, α1={n2}, α2={n3}, dur={dur}")
             robot_servos.mover_servos(n1, n2, n3, float(dur))
             if v != 0:
@@ -81,30 +133,47 @@ def ejecutar_secuencia(nombre):
 # INTERPRETACIÓN DE MENSAJES
 # -----------------------------
 def procesar_mensaje(obj):
+    """
+    Procesa un mensaje {"topic", "data"} o un lote {"topic", "batch"}.
+    Un lote se atiende en una sola pasada con un único parpadeo del LED.
+    """
     try:
         topic = obj.get("topic", None)
-        data = obj.get("data", None)
+        lote = obj.get("batch", None)
+        if lote is None:
+            lote = (obj.get("data", None),)
 
         if not topic:
             print("⚠️ Mensaje sin campo 'topic'. Ignorado.")
             return
-        if not isinstance(data, dict):
-            print("⚠️ Mensaje sin campo 'data' tipo dict. Ignorado.")
+        if not isinstance(lote, (list, tuple)):
+            print("⚠️ Campo 'batch' no es una lista. Ignorado.")
             return
 
         # 💡 Encender LED 1s al recibir mensaje
         led.value(1)
         utime.sleep(0.5)
         led.value(0)
-        print(f"\n📨 Mensaje recibido del topic: {topic}")
+        print(f"\n📨 Mensaje recibido del topic: {topic} ({len(lote)} comando(s))")
+
+        for data in lote:
+            atender(topic, data)
+
+    except Exception as e:
+        print("⚠️ Error procesando mensaje:", e)
+
+def atender(topic, data):
+    """Ejecuta un único comando 'data' recibido en 'topic'."""
+    try:
+        if not isinstance(data, dict):
+            print("⚠️ Mensaje sin campo 'data' tipo dict. Ignorado.")
+            return
 
         # --- TOPIC STATE ---
-        if topic == "UDFJC/emb1/robot2/RPi/state":
+        if topic == TOPIC_SUB_1:
             v = data.get("v")
             w = data.get("w")
-            n1 = data.get("alfa0")
-            n2 = data.get("alfa1")
-            n3 = data.get("alfa2")
+            n1, n2, n3 = resolver_angulos(data)
             dur = data.get("duration")
 
             if None in (v, w, n1, n2, n3, dur):
@@ -142,6 +211,10 @@ def procesar_mensaje(obj):
                 if not nombre or not isinstance(estados, list):
                     print("⚠️ Secuencia inválida.")
                     return
+                for i, e in enumerate(estados, 1):
+                    if not estado_alcanzable(e):
+                        print(f"⚠️ Secuencia '{nombre}' rechazada: estado [{i}] con 'target' inalcanzable.")
+                        return
                 secuencias[nombre] = estados
                 print(f"🧩 Secuencia '{nombre}' creada con {len(estados)} estados.")
                 for i, e in enumerate(estados, 1):
@@ -161,6 +234,9 @@ def procesar_mensaje(obj):
                 if nombre not in secuencias or not isinstance(nuevo, dict):
                     print(f"⚠️ No se puede agregar: secuencia '{nombre}' no encontrada.")
                     return
+                if not estado_alcanzable(nuevo):
+                    print(f"⚠️ Estado rechazado: 'target' inalcanzable para '{nombre}'.")
+                    return
                 secuencias[nombre].append(nuevo)
                 print(f"➕ Estado agregado a '{nombre}': {nuevo}")
 
@@ -202,7 +278,6 @@ import usocket as socket
 import uselect as select
 
 def recibir_loop(sock):
-    buf = b""
     print("📡 Esperando mensajes del broker...")
     poller = select.poll()
     poller.register(sock, select.POLLIN)
@@ -216,42 +291,94 @@ def recibir_loop(sock):
                 if not data:
                     print("❌ Desconectado del broker")
                     break
-                buf += data
-                while b"\n" in buf:
-                    line, buf = buf.split(b"\n", 1)
-                    if line:
-                        obj = json.loads(line.decode().strip())
-                        procesar_mensaje(obj)
+                recibir_datos(data, utime.ticks_ms())
             except OSError as e:
                 print("⚠️ Error de socket:", e)
                 continue
 
         # 2️⃣ Revisar tareas pendientes aunque no lleguen mensajes
         ahora = time.time()
-        for tarea in list(tareas_programadas):
-            nombre, t_prog = tarea
-            if ahora >= t_prog:
-                print(f"🚀 Ejecutando secuencia programada: {nombre}")
-                ejecutar_secuencia(nombre)
-                tareas_programadas.remove(tarea)
+        revisar_tareas(ahora)
+
+        # 3️⃣ Punto seguro para el GC: entre mensajes, fuera de los lazos PID
+        memoria.punto_seguro()
+        memoria.reporte_periodico(ahora)
+
+_pendiente = b""  # trama partida entre dos recv
+
+def recibir_datos(data, t_llegada=None):
+    """
+    Procesa las tramas completas de 'data'. Recorre el buffer por índices
+    (sin copiar el resto en cada trama) y solo concatena cuando una trama
+    quedó partida entre dos recv. 't_llegada' es el ticks_ms del recv: la
+    captura guarda cuándo llegó cada trama, no cuándo se procesó.
+    """
+    global _pendiente, grabadora
+    buf = _pendiente + data if _pendiente else data
+    i = 0
+    while True:
+        limites = protocolo.limites_trama(buf, i)
+        if limites is None:
+            break
+        fin, siguiente = limites
+        if grabadora and not grabadora.registrar(buf[i:fin], t_llegada):
+            grabadora = None  # captura detenida: seguir atendiendo comandos
+        # Una trama mal formada se descarta sin cortar las siguientes
+        try:
+            if buf[i] == protocolo.MARCA_BIN:
+                obj = protocolo.decodificar_bin(buf, i, fin)
+            else:
+                obj = protocolo.decodificar(buf[i:fin])
+        except Exception as e:
+            print("⚠️ Trama inválida descartada:", e)
+            obj = None
+        i = siguiente
+        if obj:
+            procesar_mensaje(obj)
+    _pendiente = buf[i:] if i < len(buf) else b""
+
+def revisar_tareas(ahora):
+    """Ejecuta las secuencias programadas cuya hora ya llegó."""
+    # Recorrido por índice: sin copiar la lista en cada vuelta del loop
+    k = 0
+    while k < len(tareas_programadas):
+        nombre, t_prog = tareas_programadas[k]
+        if ahora >= t_prog:
+            del tareas_programadas[k]
+            print(f"🚀 Ejecutando secuencia programada: {nombre}")
+            ejecutar_secuencia(nombre)
+        else:
+            k += 1
 
 # -----------------------------
 # PROGRAMA PRINCIPAL
 # -----------------------------
+# Solo al arrancar en la Pico; replay.py importa este módulo sin conectarse.
+if __name__ == "__main__":
+    wifi_lib.conectar_wifi("Conexion4.txt")  # ✅ conexión WiFi directa
+                   # ✅ sincroniza hora con NTP
+
+    memoria.configurar()  # ✅ gc.threshold de respaldo: el GC se hace en puntos seguros
 
-wifi_lib.conectar_wifi("Conexion4.txt")  # ✅ conexión WiFi directa
-               # ✅ sincroniza hora con NTP
+    if CAPTURA:
+        try:
+            grabadora = captura.Captura(CAPTURA, CAPTURA_MAX)
+        except OSError as e:
+            print("⚠️ No se pudo abrir la captura:", e)
 
-sock = conectar_broker()
+    sock = conectar_broker()
 
-# Suscribirse
-enviar_json(sock, {"action": "SUB", "topic": TOPIC_SUB_1})
-print(f"📝 Suscrito al tópico: {TOPIC_SUB_1}")
-enviar_json(sock, {"action": "SUB", "topic": TOPIC_SUB_2})
-print(f"📝 Suscrito al tópico: {TOPIC_SUB_2}")
+    # Suscribirse
+    suscribir(sock, TOPIC_SUB_1)
+    suscribir(sock, TOPIC_SUB_2)
 
-# Escuchar mensajes
-recibir_loop(sock)
+    # Escuchar mensajes
+    try:
+        recibir_loop(sock)
+    finally:
+        # No perder las últimas tramas, las más útiles tras una falla
+        if grabadora:
+            grabadora.cerrar()
 
 
 
@@ -0,0 +1,150 @@
+# ==========================================
+# memoria.py
+# Manejo del heap y del recolector de basura en sesiones largas
+# ==========================================
+#
+# En vez de dejar que el GC automático salte en medio de un lazo PID:
+#   - configurar() fija gc.threshold (por defecto -1, desactivado) en 1/4 del
+#     heap libre, para que el GC automático sea solo un respaldo
+#   - punto_seguro() se llama en las vueltas de recibir_loop y en los lazos
+#     PID justo antes del sleep, y recolecta si ya se asignó MARGEN_BYTES
+#     desde la última recolección; el PID descuenta la pausa del sleep para
+#     que la ventana de conteo de pulsos siga durando SAMPLETIME
+#   - metricas() / reporte_periodico() muestran mem_free, el bloque libre más
+#     grande y la duración de las pausas del GC
+#
+# En el PC (CPython) no hay gc.mem_free ni gc.threshold: las métricas de
+# memoria salen en None, punto_seguro() usa el contador de objetos del GC y
+# configurar() sube gc.set_threshold con la misma idea. soak_memoria.py
+# reemplaza ese contador con usar_contador() para imitar gc.mem_alloc().
+
+import gc
+import time
+
+_EN_PICO = hasattr(gc, "mem_free")
+
+if _EN_PICO:
+    from utime import ticks_us, ticks_diff
+else:
+    # En el PC las pausas se miden con el reloj real, aunque utime sea
+    # el reloj virtual de stubs_host
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+MARGEN_BYTES = 8 * 1024       # asignación tolerada entre recolecciones
+MARGEN_OBJETOS = 700          # equivalente en CPython (objetos en generación 0)
+INTERVALO_REPORTE_S = 600
+
+_contador = gc.mem_alloc if _EN_PICO else None  # bytes asignados
+_base = 0          # _contador() justo después de la última recolección
+_n_pausas = 0
+_ultima_us = 0
+_max_us = 0
+_total_us = 0
+_ultimo_reporte = 0
+
+
+def configurar():
+    """
+    Recolecta y fija gc.threshold para que el GC automático solo actúe
+    si se asigna 1/4 del heap libre sin pasar por un punto seguro
+    (el umbral cuenta bytes asignados desde la última recolección).
+    """
+    recolectar()
+    if _EN_PICO:
+        if hasattr(gc, "threshold"):
+            gc.threshold(gc.mem_free() // 4)
+    else:
+        gc.set_threshold(10 * MARGEN_OBJETOS)
+
+
+def usar_contador(f):
+    """
+    Solo en el PC: f() devuelve los bytes asignados acumulados (como
+    gc.mem_alloc() en la Pico, donde la basura sigue ocupando heap hasta
+    recolectar) y punto_seguro() decide con MARGEN_BYTES en vez de objetos.
+    """
+    global _contador, _base
+    _contador = f
+    _base = f()
+
+
+def recolectar():
+    """gc.collect() midiendo la pausa."""
+    global _base, _n_pausas, _ultima_us, _max_us, _total_us
+    t0 = ticks_us()
+    gc.collect()
+    dt = ticks_diff(ticks_us(), t0)
+    _n_pausas += 1
+    _ultima_us = dt
+    _total_us += dt
+    if dt > _max_us:
+        _max_us = dt
+    if _contador is not None:
+        _base = _contador()
+    return dt
+
+
+def punto_seguro():
+    """
+    Llamar solo donde una pausa de unos ms no afecta el control.
+    Recolecta si se acumuló suficiente basura. Devuelve la pausa en
+    segundos (0 si no recolectó) para descontarla del sleep siguiente.
+    """
+    if _contador is not None:
+        if _contador() - _base < MARGEN_BYTES:
+            return 0
+    elif gc.get_count()[0] < MARGEN_OBJETOS:
+        return 0
+    return recolectar() / 1000000
+
+
+def mayor_bloque_libre():
+    """
+    Estima el bloque contiguo libre más grande (bytes) probando a reservar
+    bytearrays por búsqueda binaria. Cuesta varias reservas y dos
+    recolecciones (medidas como las demás): no usar en los lazos de
+    control. None en CPython.
+    """
+    if not _EN_PICO:
+        return None
+    recolectar()
+    lo, hi = 0, gc.mem_free()
+    while hi - lo > 64:
+        medio = (lo + hi) // 2
+        try:
+            b = bytearray(medio)
+            del b
+            lo = medio
+        except MemoryError:
+            hi = medio
+    recolectar()
+    return lo
+
+
+def metricas():
+    """Diccionario con el estado del heap y de las pausas del GC."""
+    return {
+        "mem_free": gc.mem_free() if _EN_PICO else None,
+        "mem_alloc": gc.mem_alloc() if _EN_PICO else None,
+        "mayor_bloque": mayor_bloque_libre(),
+        "gc_pausas": _n_pausas,
+        "gc_ultima_us": _ultima_us,
+        "gc_max_us": _max_us,
+        "gc_total_us": _total_us,
+    }
+
+
+def reporte_periodico(ahora):
+    """Imprime metricas() cada INTERVALO_REPORTE_S segundos."""
+    global _ultimo_reporte
+    if ahora - _ultimo_reporte < INTERVALO_REPORTE_S:
+        return
+    _ultimo_reporte = ahora
+    m = metricas()
+    print("🧠 Memoria: libre={} asignada={} bloque_max={} | GC n={} última={}us máx={}us".format(
+        m["mem_free"], m["mem_alloc"], m["mayor_bloque"],
+        m["gc_pausas"], m["gc_ultima_us"], m["gc_max_us"]))
@@ -0,0 +1,244 @@
+# ==========================================
+# protocolo.py
+# Tramas del broker: líneas JSON (por defecto), lotes y formato binario compacto
+# ==========================================
+#
+# Formato JSON (por defecto): una línea por mensaje
+#   {"topic": "...", "data": {...}}\n
+#
+# Lote JSON: varios 'data' del mismo topic en una sola línea
+#   {"topic": "...", "batch": [{...}, {...}]}\n
+#
+# Formato binario (se pide en el SUB con "format": "bin"):
+#   0x00 | longitud (u16 LE) | topic (str8) | data
+#   str8  = longitud (u8) + bytes UTF-8
+#   data  = tipo (u8) + campos según el tipo:
+#     ESTADO      6 x f32 (v, w, alfa0, alfa1, alfa2, duration);
+#                 los estados con "target" (robot_ik) solo van en JSON
+#     CREATE      str8 nombre, u16 n, n x ESTADO
+#     DELETE      str8 nombre
+#     ADD_STATE   str8 nombre, ESTADO
+#     EXECUTE_NOW str8 nombre
+#     SCHEDULE    str8 nombre, str8 hora ISO
+#     LOTE        u16 n, n x data
+#
+# Una línea JSON nunca empieza por 0x00, así que ambos formatos pueden
+# llegar mezclados por el mismo socket.
+
+import json
+
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+MARCA_BIN = 0x00
+FORMATO_JSON = "json"
+FORMATO_BIN = "bin"
+
+CAMPOS_ESTADO = ("v", "w", "alfa0", "alfa1", "alfa2", "duration")
+_FMT_ESTADO = "<6f"
+_TAM_ESTADO = struct.calcsize(_FMT_ESTADO)
+
+T_ESTADO = 1
+T_CREATE = 2
+T_DELETE = 3
+T_ADD_STATE = 4
+T_EXECUTE_NOW = 5
+T_SCHEDULE = 6
+T_LOTE = 7
+
+_TIPO_ACCION = {
+    "create": T_CREATE,
+    "delete": T_DELETE,
+    "add_state": T_ADD_STATE,
+    "execute_now": T_EXECUTE_NOW,
+    "schedule": T_SCHEDULE,
+}
+
+
+# ------------------------------------------
+# Separación de tramas en el buffer de recepción
+# ------------------------------------------
+def limites_trama(buf, i=0):
+    """
+    Busca la trama completa que empieza en buf[i] sin copiar el buffer.
+    Devuelve (fin, siguiente): la trama es buf[i:fin] y la próxima empieza
+    en 'siguiente'. None si todavía falta recibir datos.
+    """
+    if i >= len(buf):
+        return None
+    if buf[i] == MARCA_BIN:
+        if len(buf) < i + 3:
+            return None
+        fin = i + 3 + (buf[i + 1] | (buf[i + 2] << 8))
+        if len(buf) < fin:
+            return None
+        return fin, fin
+    j = buf.find(b"\n", i)
+    if j < 0:
+        return None
+    return j, j + 1
+
+
+def decodificar(trama):
+    """
+    Convierte una trama (JSON o binaria) en el dict {"topic", "data"|"batch"}.
+    Devuelve None si la línea está vacía.
+    """
+    if trama and trama[0] == MARCA_BIN:
+        return decodificar_bin(trama)
+    linea = trama.strip()
+    if not linea:
+        return None
+    return json.loads(linea)
+
+
+# ------------------------------------------
+# Formato binario: decodificación
+# ------------------------------------------
+def _exigir(fin, i, n):
+    """Falla si leer n bytes desde i se sale de la trama."""
+    if i + n > fin:
+        raise ValueError("trama binaria truncada")
+
+
+def _leer_str(b, i, fin):
+    _exigir(fin, i, 1)
+    n = b[i]
+    i += 1
+    _exigir(fin, i, n)
+    return b[i:i + n].decode(), i + n
+
+
+def _leer_u16(b, i, fin):
+    _exigir(fin, i, 2)
+    return struct.unpack_from("<H", b, i)[0], i + 2
+
+
+def _leer_estado(b, i, fin):
+    _exigir(fin, i, _TAM_ESTADO)
+    valores = struct.unpack_from(_FMT_ESTADO, b, i)
+    estado = {}
+    for k, campo in enumerate(CAMPOS_ESTADO):
+        estado[campo] = valores[k]
+    return estado, i + _TAM_ESTADO
+
+
+def _leer_data(b, i, fin):
+    _exigir(fin, i, 1)
+    tipo = b[i]
+    i += 1
+    if tipo == T_ESTADO:
+        return _leer_estado(b, i, fin)
+    if tipo == T_LOTE:
+        n, i = _leer_u16(b, i, fin)
+        lote = []
+        for _ in range(n):
+            data, i = _leer_data(b, i, fin)
+            lote.append(data)
+        return lote, i
+
+    nombre, i = _leer_str(b, i, fin)
+    if tipo == T_CREATE:
+        n, i = _leer_u16(b, i, fin)
+        estados = []
+        for _ in range(n):
+            estado, i = _leer_estado(b, i, fin)
+            estados.append(estado)
+        return {"action": "create", "sequence": {"name": nombre, "states": estados}}, i
+    if tipo == T_DELETE:
+        return {"action": "delete", "name": nombre}, i
+    if tipo == T_ADD_STATE:
+        estado, i = _leer_estado(b, i, fin)
+        return {"action": "add_state", "name": nombre, "state": estado}, i
+    if tipo == T_EXECUTE_NOW:
+        return {"action": "execute_now", "name": nombre}, i
+    if tipo == T_SCHEDULE:
+        hora, i = _leer_str(b, i, fin)
+        return {"action": "schedule", "name": nombre, "time": hora}, i
+    raise ValueError("tipo binario desconocido: {}".format(tipo))
+
+
+def decodificar_bin(trama, i=0, fin=None):
+    """
+    Decodifica la trama binaria (con cabecera) que empieza en trama[i] y
+    termina en trama[fin] (por defecto, según su campo de longitud).
+    Ninguna lectura pasa de 'fin' y el contenido debe terminar justo ahí:
+    una longitud mal declarada es un error, no se lee la trama siguiente.
+    """
+    if fin is None:
+        _exigir(len(trama), i, 3)
+        fin = i + 3 + (trama[i + 1] | (trama[i + 2] << 8))
+    if fin > len(trama):
+        raise ValueError("trama binaria truncada")
+    topic, j = _leer_str(trama, i + 3, fin)
+    data, j = _leer_data(trama, j, fin)
+    if j != fin:
+        raise ValueError("longitud de trama binaria inconsistente")
+    if isinstance(data, list):
+        return {"topic": topic, "batch": data}
+    return {"topic": topic, "data": data}
+
+
+# ------------------------------------------
+# Formato binario: codificación
+# ------------------------------------------
+def _str8(s):
+    b = s.encode()
+    if len(b) > 255:
+        raise ValueError("texto demasiado largo: {}".format(s))
+    return bytes((len(b),)) + b
+
+
+def _estado(e):
+    if "target" in e:
+        raise ValueError("estados con 'target' solo se envían en JSON")
+    return struct.pack(_FMT_ESTADO, *[float(e[c]) for c in CAMPOS_ESTADO])
+
+
+def _codificar_data(data):
+    if isinstance(data, list):
+        partes = [bytes((T_LOTE,)), struct.pack("<H", len(data))]
+        for d in data:
+            partes.append(_codificar_data(d))
+        return b"".join(partes)
+
+    action = data.get("action", "").lower()
+    if not action:
+        return bytes((T_ESTADO,)) + _estado(data)
+    tipo = _TIPO_ACCION.get(action)
+    if tipo is None:
+        raise ValueError("acción sin formato binario: {}".format(action))
+
+    if tipo == T_CREATE:
+        secuencia = data["sequence"]
+        estados = secuencia["states"]
+        partes = [bytes((tipo,)), _str8(secuencia["name"]), struct.pack("<H", len(estados))]
+        for e in estados:
+            partes.append(_estado(e))
+        return b"".join(partes)
+
+    cuerpo = bytes((tipo,)) + _str8(data["name"])
+    if tipo == T_ADD_STATE:
+        return cuerpo + _estado(data["state"])
+    if tipo == T_SCHEDULE:
+        return cuerpo + _str8(data["time"])
+    return cuerpo
+
+
+def codificar_bin(obj):
+    """
+    Codifica un mensaje {"topic", "data"} o un lote {"topic", "batch"}
+    como trama binaria lista para enviar.
+    """
+    data = obj["batch"] if "batch" in obj else obj["data"]
+    payload = _str8(obj["topic"]) + _codificar_data(data)
+    if len(payload) > 0xFFFF:
+        raise ValueError("trama binaria demasiado grande")
+    return struct.pack("<BH", MARCA_BIN, len(payload)) + payload
+
+
+def codificar_json(obj):
+    """Codifica un mensaje como línea JSON."""
+    return (json.dumps(obj) + "\n").encode()
@@ -0,0 +1,172 @@
+# ==========================================
+# replay.py
+# Reproduce en el PC una captura del broker (captura.py) sobre main.py
+# ==========================================
+#
+#   python replay.py captura.bin              # lo más rápido posible
+#   python replay.py captura.bin --escala 1   # tiempo real
+#   python replay.py captura.bin --verbose    # mostrar los print del robot
+#
+# Reporta, por mensaje:
+#   - latencia CPU: tiempo real de PC gastado en procesar_mensaje
+#   - duración simulada: tiempo del robot (sleeps de LED, servos, PID)
+#   - espera en cola: cuánto llegó antes de que el robot lo pudiera atender
+#   - profundidad de cola: tramas recibidas y aún no atendidas
+# y por secuencia programada, el retraso respecto a su hora ('schedule').
+
+import argparse
+import contextlib
+import io
+import time
+
+import stubs_host
+
+
+def percentiles(valores, ps=(50, 95, 99)):
+    """Devuelve {p: valor} más 'max' para una lista de números."""
+    if not valores:
+        return {}
+    orden = sorted(valores)
+    res = {}
+    for p in ps:
+        k = min(len(orden) - 1, int(round(p / 100 * (len(orden) - 1))))
+        res[p] = orden[k]
+    res["max"] = orden[-1]
+    return res
+
+
+def _linea(nombre, valores, unidad, factor=1):
+    if not valores:
+        print("{:<28} sin datos".format(nombre))
+        return
+    p = percentiles(valores)
+    print("{:<28} p50={:.3f} p95={:.3f} p99={:.3f} max={:.3f} {}".format(
+        nombre, p[50] * factor, p[95] * factor, p[99] * factor, p["max"] * factor, unidad))
+
+
+class Reproductor:
+    def __init__(self, epoch, ticks0, registros, escala=0, verbose=False):
+        self.reloj = stubs_host.Reloj(epoch, escala)
+        stubs_host.instalar(self.reloj)
+        self.protocolo = __import__("protocolo")
+        self.salida = None if verbose else io.StringIO()
+        with self._silencio():
+            self.main = stubs_host.cargar_main()
+
+        # Llegada de cada trama en segundos desde el inicio de la captura
+        self.tramas = []
+        previo, t = ticks0, 0.0
+        for ticks, trama in registros:
+            t += ((ticks - previo) % (1 << 30)) / 1000  # ticks_ms da la vuelta en 2^30
+            previo = ticks
+            self.tramas.append((t, trama))
+
+        self.latencia_cpu = []
+        self.duracion_sim = []
+        self.espera_cola = []
+        self.profundidad = []
+        self.retraso_tareas = []
+        self._vencidas = []
+
+        original = self.main.ejecutar_secuencia
+
+        def ejecutar_medido(nombre):
+            # Solo cuenta las llamadas que vienen de revisar_tareas
+            if self._vencidas:
+                t_prog = self._vencidas.pop(0)
+                self.retraso_tareas.append(self.reloj.ahora() - t_prog)
+            original(nombre)
+
+        self.main.ejecutar_secuencia = ejecutar_medido
+
+    @contextlib.contextmanager
+    def _silencio(self):
+        if self.salida is None:
+            yield
+            return
+        with contextlib.redirect_stdout(self.salida):
+            yield
+        self.salida.seek(0)
+        self.salida.truncate()
+
+    def _revisar_tareas(self):
+        ahora = self.reloj.ahora()
+        self._vencidas = [t for _, t in self.main.tareas_programadas if ahora >= t]
+        self.main.revisar_tareas(int(ahora))
+        self._vencidas = []
+
+    def _esperar_hasta(self, t_llegada):
+        """Avanza el reloj hasta t_llegada, disparando las tareas que venzan."""
+        while self.reloj.t < t_llegada:
+            destino = t_llegada
+            for _, t_prog in self.main.tareas_programadas:
+                destino = min(destino, t_prog - self.reloj.epoch)
+            self.reloj.avanzar(max(0.0, destino - self.reloj.t))
+            self._revisar_tareas()
+            if destino >= t_llegada:
+                break
+
+    def correr(self):
+        n = len(self.tramas)
+        for i, (t_llegada, trama) in enumerate(self.tramas):
+            with self._silencio():
+                self._esperar_hasta(t_llegada)
+
+            # Tramas que ya llegaron y esperan detrás de esta
+            j = i
+            while j < n and self.tramas[j][0] <= self.reloj.t:
+                j += 1
+            self.profundidad.append(max(0, j - i - 1))
+            self.espera_cola.append(max(0.0, self.reloj.t - t_llegada))
+
+            t_sim0 = self.reloj.t
+            t0 = time.perf_counter()
+            with self._silencio():
+                obj = self.protocolo.decodificar(trama)
+                if obj:
+                    self.main.procesar_mensaje(obj)
+            self.latencia_cpu.append(time.perf_counter() - t0)
+            self.duracion_sim.append(self.reloj.t - t_sim0)
+
+            # Como recibir_loop: revisar la agenda después de cada lectura
+            with self._silencio():
+                self._revisar_tareas()
+
+        # Dejar correr las tareas que quedaron programadas
+        with self._silencio():
+            while self.main.tareas_programadas:
+                antes = len(self.main.tareas_programadas)
+                self._esperar_hasta(min(t for _, t in self.main.tareas_programadas) - self.reloj.epoch)
+                self._revisar_tareas()
+                if len(self.main.tareas_programadas) == antes:
+                    break
+
+    def reporte(self):
+        print("\n📊 Replay: {} tramas, {:.1f} s simulados".format(len(self.tramas), self.reloj.t))
+        _linea("latencia CPU por mensaje", self.latencia_cpu, "ms", 1000)
+        _linea("duración simulada", self.duracion_sim, "s")
+        _linea("espera en cola", self.espera_cola, "s")
+        _linea("profundidad de cola", self.profundidad, "tramas")
+        _linea("retraso de 'schedule'", self.retraso_tareas, "s")
+
+
+def main():
+    import captura
+
+    ap = argparse.ArgumentParser(description="Reproduce una captura del broker sobre main.py")
+    ap.add_argument("archivo")
+    ap.add_argument("--escala", type=float, default=0,
+                    help="1 = tiempo real, 0 = lo más rápido posible (por defecto)")
+    ap.add_argument("--verbose", action="store_true", help="mostrar los print del robot")
+    args = ap.parse_args()
+
+    epoch, ticks0, registros = captura.leer_captura(args.archivo)
+    r = Reproductor(epoch, ticks0, registros, args.escala, args.verbose)
+    t0 = time.perf_counter()
+    r.correr()
+    print("⏱️ Reproducción en {:.2f} s reales".format(time.perf_counter() - t0))
+    r.reporte()
+
+
+if __name__ == "__main__":
+    main()
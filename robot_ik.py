@@ -0,0 +1,265 @@
+# ==========================================
+# robot_ik.py
+# Cinemática inversa del brazo de 3 articulaciones
+# ==========================================
+#
+# Convenciones (las mismas de robot_servos.mover_servos):
+#   alfa0: giro de la base, -90..90 (0 = al frente, eje x)
+#   alfa1: hombro medido desde la horizontal, 0..180
+#   alfa2: codo relativo al brazo, -90..45, con el rango acoplado a alfa1
+#          por robot_servos.tabla
+#
+# Cinemática directa (cm):
+#   r = L1*cos(a1) + L2*cos(a1+a2)         (distancia horizontal con signo)
+#   z = ALTURA_HOMBRO + L1*sin(a1) + L2*sin(a1+a2)
+#   x = r*cos(a0), y = r*sin(a0)
+#
+# resolver(x, y, z) no resuelve desde cero: busca una semilla en una grilla
+# (r, z) precalculada del espacio de trabajo alcanzable y la refina con unas
+# pocas iteraciones de mínimos cuadrados amortiguados. Los objetivos
+# repetidos salen de una caché LRU.
+
+import math
+from array import array
+
+from robot_servos import tabla
+
+# === Geometría del brazo (cm) — medir en el robot ===
+L1 = 8.0
+L2 = 8.0
+ALTURA_HOMBRO = 6.0
+
+# === Parámetros de la grilla y del refinamiento ===
+PASO_GRADOS = 3        # muestreo de alfa1/alfa2 al construir la grilla
+CELDA_CM = 1.0         # tamaño de celda en (r, z)
+TOLERANCIA_CM = 0.2    # error máximo aceptado en la posición final
+ITERACIONES = 15
+AMORTIGUAMIENTO = 0.5  # cm, para el paso de mínimos cuadrados
+TAM_CACHE = 32
+
+_ALCANCE = L1 + L2
+_COLUMNAS = int(2 * _ALCANCE / CELDA_CM) + 1
+_FILAS = int(2 * _ALCANCE / CELDA_CM) + 1
+_VACIA = -1000
+
+_grilla_a1 = None
+_grilla_a2 = None
+
+
+# ====================================
+# ======== LÍMITES ACOPLADOS =========
+# ====================================
+def limites_alfa2(alfa1):
+    """
+    Rango (min, max) permitido para alfa2 con el hombro en alfa1,
+    según la tabla de robot_servos. None si no hay rango válido.
+    """
+    ang2 = max(1, min(180, int(round(180 - alfa1))))
+    rango_min, rango_max = tabla[ang2]
+    lo = max(rango_min, 0) - 90
+    hi = min(rango_max, 135) - 90
+    if lo > hi:
+        return None
+    return lo, hi
+
+
+def dentro_de_limites(alfa0, alfa1, alfa2):
+    """True si mover_servos aplicaría estos ángulos sin recortarlos."""
+    if not (-90 <= alfa0 <= 90 and 0 <= alfa1 <= 180):
+        return False
+    rango = limites_alfa2(alfa1)
+    return rango is not None and rango[0] <= alfa2 <= rango[1]
+
+
+# ====================================
+# ======== CINEMÁTICA DIRECTA ========
+# ====================================
+def directa_plana(alfa1, alfa2):
+    """(r, z) del efector para el hombro y codo dados (grados)."""
+    a1 = math.radians(alfa1)
+    a12 = math.radians(alfa1 + alfa2)
+    r = L1 * math.cos(a1) + L2 * math.cos(a12)
+    z = ALTURA_HOMBRO + L1 * math.sin(a1) + L2 * math.sin(a12)
+    return r, z
+
+
+def directa(alfa0, alfa1, alfa2):
+    """(x, y, z) del efector en cm."""
+    r, z = directa_plana(alfa1, alfa2)
+    a0 = math.radians(alfa0)
+    return r * math.cos(a0), r * math.sin(a0), z
+
+
+# ====================================
+# ======== GRILLA DEL ESPACIO ========
+# ====================================
+def _celda(r, z):
+    col = int((r + _ALCANCE) / CELDA_CM + 0.5)
+    fila = int((z - ALTURA_HOMBRO + _ALCANCE) / CELDA_CM + 0.5)
+    if 0 <= col < _COLUMNAS and 0 <= fila < _FILAS:
+        return fila * _COLUMNAS + col
+    return None
+
+
+def construir_grilla():
+    """
+    Recorre (alfa1, alfa2) dentro de los límites acoplados y guarda, por
+    celda (r, z), la pareja de ángulos cuyo punto cae más cerca del centro.
+    Se llama sola en la primera consulta.
+    """
+    global _grilla_a1, _grilla_a2
+    n = _COLUMNAS * _FILAS
+    a1s = array("h", [_VACIA] * n)
+    a2s = array("h", [_VACIA] * n)
+    mejor = array("f", [CELDA_CM] * n)
+
+    for alfa1 in range(0, 181, PASO_GRADOS):
+        rango = limites_alfa2(alfa1)
+        if rango is None:
+            continue
+        for alfa2 in range(int(rango[0]), int(rango[1]) + 1, PASO_GRADOS):
+            r, z = directa_plana(alfa1, alfa2)
+            k = _celda(r, z)
+            if k is None:
+                continue
+            centro_r = (k % _COLUMNAS) * CELDA_CM - _ALCANCE
+            centro_z = (k // _COLUMNAS) * CELDA_CM - _ALCANCE + ALTURA_HOMBRO
+            d = abs(r - centro_r) + abs(z - centro_z)
+            if d < mejor[k]:
+                mejor[k] = d
+                a1s[k] = alfa1
+                a2s[k] = alfa2
+
+    _grilla_a1, _grilla_a2 = a1s, a2s
+
+
+def _semillas(r, z):
+    """Semillas de la celda del objetivo y luego de sus vecinas, de cerca a lejos."""
+    col = int((r + _ALCANCE) / CELDA_CM + 0.5)
+    fila = int((z - ALTURA_HOMBRO + _ALCANCE) / CELDA_CM + 0.5)
+    for radio in (0, 1, 2):
+        for df in range(-radio, radio + 1):
+            for dc in range(-radio, radio + 1):
+                if max(abs(df), abs(dc)) != radio:
+                    continue
+                f, c = fila + df, col + dc
+                if not (0 <= f < _FILAS and 0 <= c < _COLUMNAS):
+                    continue
+                k = f * _COLUMNAS + c
+                if _grilla_a1[k] != _VACIA:
+                    yield _grilla_a1[k], _grilla_a2[k]
+
+
+# ====================================
+# ======== REFINAMIENTO LOCAL ========
+# ====================================
+def _refinar(r_obj, z_obj, alfa1, alfa2):
+    """
+    Mínimos cuadrados amortiguados sobre (alfa1, alfa2) desde la semilla,
+    recortando a los límites acoplados en cada paso (el amortiguamiento
+    evita que el brazo estirado, alfa2 = 0, sea singular).
+    Devuelve (alfa1, alfa2, error_cm).
+    """
+    lam2 = AMORTIGUAMIENTO * AMORTIGUAMIENTO
+    for _ in range(ITERACIONES):
+        r, z = directa_plana(alfa1, alfa2)
+        er = r_obj - r
+        ez = z_obj - z
+        if er * er + ez * ez < (TOLERANCIA_CM / 4) ** 2:
+            break
+
+        a1 = math.radians(alfa1)
+        a12 = math.radians(alfa1 + alfa2)
+        # Jacobiano de (r, z) respecto a (a1, a2) en radianes
+        j11 = -L1 * math.sin(a1) - L2 * math.sin(a12)
+        j12 = -L2 * math.sin(a12)
+        j21 = L1 * math.cos(a1) + L2 * math.cos(a12)
+        j22 = L2 * math.cos(a12)
+        # d = J^T (J J^T + lambda^2 I)^-1 e
+        a = j11 * j11 + j12 * j12 + lam2
+        b = j11 * j21 + j12 * j22
+        c = j21 * j21 + j22 * j22 + lam2
+        det = a * c - b * b
+        u1 = (c * er - b * ez) / det
+        u2 = (a * ez - b * er) / det
+        d1 = j11 * u1 + j21 * u2
+        d2 = j12 * u1 + j22 * u2
+
+        alfa1 = max(0.0, min(180.0, alfa1 + math.degrees(d1)))
+        rango = limites_alfa2(alfa1)
+        if rango is None:
+            break
+        alfa2 = max(rango[0], min(rango[1], alfa2 + math.degrees(d2)))
+
+    r, z = directa_plana(alfa1, alfa2)
+    error = math.sqrt((r_obj - r) ** 2 + (z_obj - z) ** 2)
+    return alfa1, alfa2, error
+
+
+# ====================================
+# ======== CACHÉ LRU =================
+# ====================================
+class _LRU:
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self.datos = {}
+        self.orden = []
+
+    def get(self, clave):
+        if clave not in self.datos:
+            return None
+        self.orden.remove(clave)
+        self.orden.append(clave)
+        return self.datos[clave]
+
+    def put(self, clave, valor):
+        if clave in self.datos:
+            self.orden.remove(clave)
+        elif len(self.orden) >= self.capacidad:
+            del self.datos[self.orden.pop(0)]
+        self.datos[clave] = valor
+        self.orden.append(clave)
+
+
+_cache = _LRU(TAM_CACHE)
+_FUERA = ()  # marca en caché de objetivo inalcanzable
+
+
+# ====================================
+# ======== FUNCIÓN PRINCIPAL =========
+# ====================================
+def resolver(x, y, z):
+    """
+    Ángulos (alfa0, alfa1, alfa2) que llevan la pinza a (x, y, z) en cm,
+    respetando los límites acoplados. None si el punto no es alcanzable.
+    """
+    clave = (int(round(x * 10)), int(round(y * 10)), int(round(z * 10)))
+    guardado = _cache.get(clave)
+    if guardado is not None:
+        return guardado or None
+
+    if _grilla_a1 is None:
+        construir_grilla()
+
+    # Base: alfa0 solo cubre -90..90, los puntos de atrás usan r negativo
+    r = math.sqrt(x * x + y * y)
+    alfa0 = math.degrees(math.atan2(y, x)) if r > 1e-9 else 0.0
+    if alfa0 > 90:
+        alfa0 -= 180
+        r = -r
+    elif alfa0 < -90:
+        alfa0 += 180
+        r = -r
+
+    solucion = None
+    for a1, a2 in _semillas(r, z):
+        alfa1, alfa2, error = _refinar(r, z, a1, a2)
+        if error <= TOLERANCIA_CM:
+            alfa1 = round(alfa1, 1)
+            alfa2 = round(alfa2, 1)
+            if dentro_de_limites(alfa0, alfa1, alfa2):
+                solucion = (round(alfa0, 1), alfa1, alfa2)
+                break
+
+    _cache.put(clave, solucion or _FUERA)
+    return solucion
@@ -2,6 +2,7 @@ from picozero import DigitalInputDevice, Robot, DigitalOutputDevice
 from time import sleep, time
 
 import math
+import memoria
 
 # ====================================
 # ======== CLASE ENCODER =============
@@ -31,6 +32,7 @@ SAMPLETIME = 0.1     # segundos
 KP = 0.02
 KD = 0.001
 KI = 0.0005
+TRAZA_PID = False    # True = imprimir cada muestra (asigna memoria en cada vuelta)
 
 RANURAS_DISCO = 20        # número de ranuras del disco encoder
 RADIO_LLANTA_CM = 7     # distancia del eje a la llanta
@@ -132,7 +134,8 @@ def mover_recto(velocidad_dm_s, tiempo_s):
             r.value = (-m1_speed, -m2_speed)
 
         # Mostrar datos
-        print(f"v_e1={v_e1:.3f} | v_e2={v_e2:.3f} | m1={direccion*m1_speed:.2f} | m2={direccion*m2_speed:.2f}")
+        if TRAZA_PID:
+            print(f"v_e1={v_e1:.3f} | v_e2={v_e2:.3f} | m1={direccion*m1_speed:.2f} | m2={direccion*m2_speed:.2f}")
 
         # Reset para siguiente iteración
         e1.reset()
@@ -142,7 +145,11 @@ def mover_recto(velocidad_dm_s, tiempo_s):
         e1_sum_error += e1_error
         e2_sum_error += e2_error
 
-        sleep(SAMPLETIME)
+        # GC antes del sleep, no en medio del cálculo. La ventana de pulsos
+        # va desde reset() hasta la próxima lectura: descontar la pausa
+        # para que siga durando SAMPLETIME
+        pausa = memoria.punto_seguro()
+        sleep(max(0, SAMPLETIME - pausa))
 
     # Detener robot
     r.stop()
@@ -207,13 +214,15 @@ def girar(velocidad_angular, tiempo_s):
         else:
             r.value = (-m1_speed, m2_speed)
 
-        print(f"ω_real={vel_ang_real:.3f} | ω_target={sentido * velocidad_angular:.3f} | m1={m1_speed:.2f} | m2={m2_speed:.2f}")
+        if TRAZA_PID:
+            print(f"ω_real={vel_ang_real:.3f} | ω_target={sentido * velocidad_angular:.3f} | m1={m1_speed:.2f} | m2={m2_speed:.2f}")
 
         e1.reset()
         e2.reset()
         prev_error = error
         sum_error += error
-        sleep(SAMPLETIME)
+        pausa = memoria.punto_seguro()
+        sleep(max(0, SAMPLETIME - pausa))
 
     r.stop()
     print("✅ Giro completado")
@@ -0,0 +1,178 @@
+# ==========================================
+# soak_memoria.py
+# Sesión larga simulada en el PC para vigilar asignaciones y fugas
+# ==========================================
+#
+#   python soak_memoria.py                 # 8 h simuladas, teleop a 1 Hz
+#   python soak_memoria.py --horas 1 --hz 5 --formato bin
+#
+# Carga main.py con stubs_host (reloj virtual, lo más rápido posible) y le
+# entrega el tráfico como lo haría recibir_loop: trozos de hasta 1024 bytes
+# a recibir_datos(), y cada 100 ms simulados revisar_tareas() y
+# memoria.punto_seguro().
+#
+# Tráfico: 'state' de teleoperación a --hz y, cada minuto, un ciclo de
+# secuencia create -> schedule (+20 s) -> delete, con tramos de motor para
+# pasar por los lazos PID.
+#
+# Por hora simulada reporta, con tracemalloc:
+#   - bloques netos retenidos por mensaje, entre los cierres de hora tras
+#     gc.collect (debe tender a 0: si crece, hay fuga)
+#   - pico de bytes temporales por mensaje
+#   - memoria viva al cerrar cada hora (tras gc.collect), tamaño de
+#     'secuencias' y pausas del GC en puntos seguros
+#
+# En CPython la basura se libera al momento y punto_seguro() casi nunca
+# recolectaría. Para ejercitar la política como en la Pico, los bytes
+# temporales de cada mensaje se suman a un contador que hace de
+# gc.mem_alloc() (memoria.usar_contador): se recolecta cada MARGEN_BYTES.
+# Las pausas son las de CPython con tracemalloc activo, no las de la Pico;
+# sirven para ver cuántas recolecciones hay y que no crezcan con las horas.
+
+import argparse
+import contextlib
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import protocolo
+import stubs_host
+
+TOPIC_SEQ = "UDFJC/emb1/robot2/RPi/sequence"
+TAM_RECV = 1024
+TICK_S = 0.1
+
+
+def _estado(k, v=0):
+    return {"v": v, "w": 0, "alfa0": k % 60 - 30, "alfa1": 45, "alfa2": -60, "duration": 0.2}
+
+
+def generar_eventos(segundos, hz, topic_state):
+    """Lista (t, obj) ordenada por tiempo de llegada."""
+    eventos = []
+    for k in range(int(segundos * hz)):
+        eventos.append((k / hz, {"topic": topic_state, "data": _estado(k)}))
+    for ciclo in range(int(segundos // 60)):
+        t = ciclo * 60 + 0.5
+        nombre = "soak{}".format(ciclo)
+        estados = [_estado(j, v=1 if j == 2 else 0) for j in range(5)]
+        eventos.append((t, {"topic": TOPIC_SEQ, "data": {
+            "action": "create", "sequence": {"name": nombre, "states": estados}}}))
+        eventos.append((t + 1, {"topic": TOPIC_SEQ, "data": {
+            "action": "schedule", "name": nombre, "time": None}}))
+        eventos.append((t + 50, {"topic": TOPIC_SEQ, "data": {"action": "delete", "name": nombre}}))
+    eventos.sort(key=lambda e: e[0])
+    return eventos
+
+
+def _viva():
+    """Bytes vivos sin contar la basura que el GC aún no recogió."""
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+class Hora:
+    def __init__(self):
+        self.mensajes = 0
+        self.pico = 0
+        self.pico_max = 0
+
+
+def correr(horas, hz, formato):
+    reloj = stubs_host.Reloj(epoch=1893456000)  # 2030-01-01 00:00:00 UTC
+    stubs_host.instalar(reloj)
+    nulo = open(os.devnull, "w")
+    with contextlib.redirect_stdout(nulo):
+        main = stubs_host.cargar_main()
+    memoria = sys.modules["memoria"]
+    memoria.configurar()
+    codificar = protocolo.codificar_bin if formato == protocolo.FORMATO_BIN else protocolo.codificar_json
+
+    segundos = horas * 3600
+    eventos = generar_eventos(segundos, hz, main.TOPIC_SUB_1)
+    por_hora = [Hora() for _ in range(int(horas + 0.999))]
+    vivas = []
+
+    def cerrar_hora():
+        vivas.append(_viva())
+        bloques.append(sys.getallocatedblocks())
+        pausas.append(memoria.metricas()["gc_pausas"])
+
+    tracemalloc.start()
+    # Al cerrar cada hora (y al empezar): bloques tras gc.collect y
+    # recolecciones acumuladas
+    gc.collect()
+    bloques = [sys.getallocatedblocks()]
+    pausas = [memoria.metricas()["gc_pausas"]]
+    asignado = [0]  # bytes temporales acumulados, hace de gc.mem_alloc()
+    memoria.usar_contador(lambda: asignado[0])
+    proximo_tick = 0.0
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(nulo):
+        for t, obj in eventos:
+            # Vueltas de recibir_loop sin mensajes hasta que llega este
+            while proximo_tick <= t:
+                reloj.avanzar(max(0.0, proximo_tick - reloj.t))
+                main.revisar_tareas(int(reloj.ahora()))
+                memoria.punto_seguro()
+                proximo_tick = max(proximo_tick + TICK_S, reloj.t)
+            reloj.avanzar(max(0.0, t - reloj.t))
+
+            if obj["data"].get("action") == "schedule":
+                # Copia: no guardar la hora en 'eventos' (se vería como fuga)
+                hora = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(reloj.ahora() + 20))
+                obj = {"topic": obj["topic"], "data": dict(obj["data"], time=hora)}
+            trama = codificar(obj)
+
+            k = min(int(reloj.t // 3600), len(por_hora) - 1)
+            while len(vivas) < k:
+                cerrar_hora()
+            h = por_hora[k]
+
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            for i in range(0, len(trama), TAM_RECV):
+                main.recibir_datos(trama[i:i + TAM_RECV])
+            pico = tracemalloc.get_traced_memory()[1] - base
+            asignado[0] += pico
+            h.mensajes += 1
+            h.pico += pico
+            h.pico_max = max(h.pico_max, pico)
+
+            main.revisar_tareas(int(reloj.ahora()))
+            memoria.punto_seguro()
+    while len(vivas) < len(por_hora):
+        cerrar_hora()
+    tracemalloc.stop()
+
+    real = time.perf_counter() - t0
+    m = memoria.metricas()
+    print("⏱️ {:.1f} h simuladas en {:.1f} s reales, {} mensajes ({})".format(
+        reloj.t / 3600, real, len(eventos), formato))
+    print("{:>4} {:>9} {:>14} {:>14} {:>12} {:>12} {:>8}".format(
+        "hora", "mensajes", "netos/msg", "pico B/msg", "pico máx B", "vivo KB", "GC n"))
+    for k, h in enumerate(por_hora):
+        n = h.mensajes or 1
+        print("{:>4} {:>9} {:>14.3f} {:>14.0f} {:>12} {:>12.1f} {:>8}".format(
+            k + 1, h.mensajes, (bloques[k + 1] - bloques[k]) / n, h.pico / n, h.pico_max, vivas[k] / 1024,
+            pausas[k + 1] - pausas[k]))
+    print("secuencias vivas: {} | tareas pendientes: {}".format(
+        len(main.secuencias), len(main.tareas_programadas)))
+    print("GC en puntos seguros (cada {} B, pausas de CPython): n={} máx={}us total={}ms".format(
+        memoria.MARGEN_BYTES, m["gc_pausas"], m["gc_max_us"], m["gc_total_us"] // 1000))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Soak de memoria de main.py en el PC")
+    ap.add_argument("--horas", type=float, default=8)
+    ap.add_argument("--hz", type=float, default=1, help="mensajes 'state' por segundo")
+    ap.add_argument("--formato", choices=(protocolo.FORMATO_JSON, protocolo.FORMATO_BIN),
+                    default=protocolo.FORMATO_JSON)
+    args = ap.parse_args()
+    correr(args.horas, args.hz, args.formato)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# ==========================================
+# stubs_host.py
+# Módulos falsos de MicroPython para correr el código del robot en el PC
+# ==========================================
+#
+# Uso:
+#   reloj = stubs_host.Reloj(epoch_inicial, escala=0)
+#   stubs_host.instalar(reloj)
+#   main = stubs_host.cargar_main()
+#
+# El reloj es virtual: sleep() avanza el tiempo simulado y solo espera de
+# verdad 'escala' veces lo pedido (0 = lo más rápido posible, 1 = tiempo real).
+
+import calendar
+import os
+import sys
+import time as _time
+import types
+
+_PERIODO_TICKS = 1 << 30  # como en MicroPython
+_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Funciones llamadas en cada duty_u16 de un PWM (ver fleet_sim.py)
+observadores_pwm = []
+
+
+# ------------------------------------------
+# Reloj virtual (time / utime)
+# ------------------------------------------
+class Reloj:
+    def __init__(self, epoch=0, escala=0):
+        self.epoch = epoch
+        self.escala = escala
+        self.t = 0.0  # segundos simulados desde el inicio
+
+    def avanzar(self, segundos):
+        if segundos <= 0:
+            return
+        self.t += segundos
+        if self.escala:
+            _time.sleep(segundos * self.escala)
+
+    def ahora(self):
+        """Epoch simulado con decimales."""
+        return self.epoch + self.t
+
+    def modulo(self):
+        """Crea el módulo que reemplaza a time y utime."""
+        m = types.ModuleType("utime")
+        reloj = self
+
+        def ticks_ms():
+            return int(reloj.t * 1000) % _PERIODO_TICKS
+
+        def ticks_us():
+            return int(reloj.t * 1000000) % _PERIODO_TICKS
+
+        def ticks_diff(a, b):
+            d = (a - b) % _PERIODO_TICKS
+            return d - _PERIODO_TICKS if d >= _PERIODO_TICKS // 2 else d
+
+        def mktime(t):
+            return calendar.timegm(tuple(t[:6]) + (0, 0, 0))
+
+        def localtime(s=None):
+            return _time.gmtime(reloj.ahora() if s is None else s)[:8]
+
+        m.time = lambda: int(reloj.ahora())
+        m.sleep = reloj.avanzar
+        m.sleep_ms = lambda ms: reloj.avanzar(ms / 1000)
+        m.sleep_us = lambda us: reloj.avanzar(us / 1000000)
+        m.ticks_ms = ticks_ms
+        m.ticks_us = ticks_us
+        m.ticks_diff = ticks_diff
+        m.ticks_add = lambda a, b: (a + b) % _PERIODO_TICKS
+        m.mktime = mktime
+        m.localtime = localtime
+        m.gmtime = localtime
+        # No existe en MicroPython: memoria.py la usa para medir pausas reales
+        m.perf_counter = _time.perf_counter
+        return m
+
+
+class RelojReal(Reloj):
+    """
+    Reloj de pared compartido por varios hilos (fleet_sim.py): time() es la
+    hora real y sleep() espera 'escala' veces lo pedido.
+    """
+
+    def __init__(self, escala=0):
+        self.epoch = _time.time()
+        self.escala = escala
+
+    @property
+    def t(self):
+        return _time.time() - self.epoch
+
+    def avanzar(self, segundos):
+        # Con escala 0 igual se cede el GIL a los demás robots
+        _time.sleep(max(0.0, segundos) * self.escala)
+
+
+# ------------------------------------------
+# machine, network, ntptime
+# ------------------------------------------
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 2
+
+    def __init__(self, pin, mode=None, pull=None):
+        self.pin = pin
+        self._value = 0
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+
+
+class PWM:
+    def __init__(self, pin):
+        self.pin = pin
+        self.duty = 0
+
+    def freq(self, f=None):
+        pass
+
+    def duty_u16(self, d=None):
+        if d is None:
+            return self.duty
+        self.duty = d
+        for obs in observadores_pwm:
+            obs(self)
+
+
+class RTC:
+    def datetime(self, dt=None):
+        return None
+
+
+class WLAN:
+    def __init__(self, interfaz=None):
+        pass
+
+    def active(self, v=None):
+        return True
+
+    def connect(self, ssid, password):
+        pass
+
+    def isconnected(self):
+        return True
+
+    def ifconfig(self):
+        return ("127.0.0.1", "255.0.0.0", "127.0.0.1", "127.0.0.1")
+
+
+def _modulo(nombre, **atributos):
+    m = types.ModuleType(nombre)
+    for k, v in atributos.items():
+        setattr(m, k, v)
+    return m
+
+
+def instalar(reloj, usocket=None, uselect=None):
+    """
+    Registra los módulos falsos en sys.modules. Debe llamarse antes de
+    importar main, robot_servos, robot_pid o rtc_lib.
+    'usocket'/'uselect' permiten usar sockets reales (fleet_sim.py).
+    """
+    t = reloj.modulo()
+    sys.modules["machine"] = _modulo("machine", Pin=Pin, PWM=PWM, RTC=RTC)
+    sys.modules["network"] = _modulo("network", WLAN=WLAN, STA_IF=0)
+    sys.modules["ntptime"] = _modulo("ntptime", host="", settime=lambda: None)
+    sys.modules["usocket"] = usocket or _modulo("usocket", socket=None)
+    sys.modules["uselect"] = uselect or _modulo("uselect", poll=None, POLLIN=1)
+    sys.modules["utime"] = t
+
+    # Los módulos del robot hacen 'import time' / 'from time import sleep':
+    # se les da el reloj virtual solo mientras se importan.
+    real = sys.modules["time"]
+    sys.modules["time"] = t
+    sys.modules.pop("picozero_stub", None)
+    try:
+        # picozero_stub usa machine, por eso se importa después de registrarlo
+        sys.modules["picozero"] = __import__("picozero_stub")
+        for nombre in ("robot_servos", "robot_pid", "rtc_lib", "wifi_lib", "captura"):
+            sys.modules.pop(nombre, None)
+            __import__(nombre)
+    finally:
+        sys.modules["time"] = real
+
+
+def cargar_main(nombre="main", config=None):
+    """
+    Carga main.py como módulo 'nombre' sin ejecutar el programa principal.
+    'config' reemplaza el contenido de Conexion4.txt.
+    Cada llamada con otro nombre da una instancia independiente del robot.
+    """
+    import wifi_lib
+
+    original = wifi_lib.cargar_config
+    if config is not None:
+        wifi_lib.cargar_config = lambda nombre_archivo: dict(config)
+    real = sys.modules["time"]
+    sys.modules["time"] = sys.modules["utime"]
+    try:
+        m = types.ModuleType(nombre)
+        m.__file__ = "main.py"
+        with open(os.path.join(_DIR, "main.py"), encoding="utf-8") as f:
+            codigo = compile(f.read(), "main.py", "exec")
+        sys.modules[nombre] = m
+        exec(codigo, m.__dict__)
+    finally:
+        sys.modules["time"] = real
+        wifi_lib.cargar_config = original
+    return m